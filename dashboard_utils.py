@@ -0,0 +1,363 @@
+# dashboard_utils.py - Shared PostgreSQL data loading for the Streamlit dashboards
+import streamlit as st
+import pandas as pd
+import psycopg2
+from psycopg2 import pool
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import io
+import threading
+from contextlib import contextmanager
+from datetime import date
+
+# Database connection parameters, loaded from .env by db_utils (shared with the bot)
+from db_utils import PGHOST, PGPORT, PGDATABASE, PGUSER, PGPASSWORD, PGSSLMODE
+
+@st.cache_resource(ttl=300)  # Re-resolve every 5 minutes
+def resolve_ipv4(host, port):
+    """Resolve a hostname to its first IPv4 address, or return it unchanged if that fails."""
+    import socket
+    import ipaddress
+    
+    host_ip = host
+    try:
+        # Get all address info and filter for IPv4 only
+        addr_info_list = socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM)
+        if addr_info_list:
+            # Get the first IPv4 address
+            for addr_info in addr_info_list:
+                if addr_info[0] == socket.AF_INET:  # Ensure it's IPv4
+                    host_ip = addr_info[4][0]
+                    # Verify it's actually an IPv4 address
+                    try:
+                        ipaddress.IPv4Address(host_ip)
+                        break
+                    except ValueError:
+                        continue
+    except (socket.gaierror, OSError, ValueError):
+        # If resolution fails, try using the hostname with IPv4 socket option
+        pass
+    return host_ip
+
+class WaitingConnectionPool(pool.ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool whose getconn() waits for a free connection when all are
+    checked out, instead of raising PoolError straight away.
+    """
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+
+    def getconn(self, key=None):
+        # One holder can keep its connection through a replacement connect (connect_timeout=10),
+        # load_view()'s three statements at up to 3 s each (19 s in all) plus the COPY transfer;
+        # 30 s covers that, so only a stuck holder or a long queue of waiters times out here
+        if not self._slots.acquire(timeout=30):
+            raise pool.PoolError("timed out waiting for a free database connection")
+        try:
+            return super().getconn(key)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+class IPv4ConnectionPool(WaitingConnectionPool):
+    """
+    Connection pool that resolves host to IPv4 for every new connection it opens,
+    so a changed pooler address is picked up once resolve_ipv4()'s cache expires.
+    """
+
+    def __init__(self, host, port, minconn, maxconn, *args, **kwargs):
+        self._host = host
+        self._port = port
+        self._host_ip = resolve_ipv4(host, port)
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        # Resolve before taking the pool lock: when resolve_ipv4()'s cache expires the
+        # DNS lookup blocks, and it mustn't stall threads that are returning connections
+        self._host_ip = resolve_ipv4(self._host, self._port)
+        return super().getconn(key)
+
+    def _connect(self, key=None):
+        # Only called from __init__ or with the pool lock held, so updating kwargs is safe
+        self._kwargs['host'] = self._host_ip
+        return super()._connect(key)
+
+@st.cache_resource
+def get_pool():
+    """
+    Create the PostgreSQL connection pool (IPv4, connection timeout) once per process.
+    Queries then reuse pooled connections instead of paying TLS and auth on every refresh.
+    """
+    if not all([PGHOST, PGDATABASE, PGUSER, PGPASSWORD]):
+        raise ValueError(
+            "Please set PGHOST, PGDATABASE, PGUSER, PGPASSWORD environment variables. "
+            "Create a .env file or set them as environment variables."
+        )
+    
+    # Build connection parameters; the pool adds the host, resolved to IPv4 per connection
+    # Use connection string format which gives more control
+    conn_string = f"port={PGPORT} dbname={PGDATABASE} user={PGUSER} password={PGPASSWORD} connect_timeout=10"
+    if PGSSLMODE:
+        conn_string += f" sslmode={PGSSLMODE}"
+    # TCP keepalives let long-lived pooled connections detect a dropped pooler link
+    conn_string += " keepalives=1 keepalives_idle=30 keepalives_interval=10 keepalives_count=3"
+    
+    # Try to connect with IPv4 preference; a few connections are plenty for the
+    # dashboard and keep Supabase pooler usage low
+    try:
+        return IPv4ConnectionPool(PGHOST, PGPORT, 1, 3, conn_string)
+    except psycopg2.OperationalError as e:
+        # If direct connection fails, suggest using pooler
+        error_msg = str(e)
+        if "IPv6" in error_msg or "Cannot assign requested address" in error_msg:
+            # Try to construct pooler URL as fallback
+            # Supabase pooler format: aws-0-[region].pooler.supabase.com
+            if "supabase.co" in PGHOST:
+                # Extract region/project info and suggest pooler
+                st.warning("⚠️ Direct connection failed. Please use Supabase Connection Pooler instead.")
+                st.info("""
+                **To fix this:**
+                1. Go to Supabase Dashboard → Settings → Database
+                2. Scroll to "Connection string" section
+                3. Select **"Session pooler"** mode
+                4. Copy the connection string
+                5. Extract the host (e.g., `aws-0-us-east-1.pooler.supabase.com`)
+                6. Update your `.env` file:
+                   - `PGHOST=aws-0-[region].pooler.supabase.com`
+                   - `PGPORT=6543` (for Session pooler)
+                """)
+        raise
+
+def begin_read(conn):
+    """Start a read-only transaction on conn whose statements time out after 3 seconds."""
+    if not conn.readonly:
+        # The dashboard never writes
+        conn.set_session(readonly=True)
+    with conn.cursor() as cur:
+        # A slow query fails fast instead of freezing the dashboard
+        cur.execute("SET LOCAL statement_timeout = '3s'")
+
+@contextmanager
+def db_connection():
+    """
+    Borrow a connection from the pool and give it back when done.
+    A connection the server has dropped is replaced on checkout.
+    """
+    db_pool = get_pool()
+    conn = db_pool.getconn()
+    try:
+        # Also a liveness check, like SQLAlchemy's pool_pre_ping
+        begin_read(conn)
+    except psycopg2.Error:
+        db_pool.putconn(conn, close=True)
+        conn = db_pool.getconn()
+        try:
+            begin_read(conn)
+        except BaseException:
+            # Still failing (e.g. the database behind the pooler is down): close this
+            # one too, so its pool slot isn't lost
+            db_pool.putconn(conn, close=True)
+            raise
+    except BaseException:
+        db_pool.putconn(conn, close=True)
+        raise
+    try:
+        yield conn
+    finally:
+        # putconn() rolls back the open transaction before pooling the connection
+        db_pool.putconn(conn)
+
+def show_db_error(e):
+    """Show a database error, with the pooler hint for IPv6 connection failures."""
+    error_msg = str(e)
+    if isinstance(e, psycopg2.OperationalError):
+        if "IPv6" in error_msg or "Cannot assign requested address" in error_msg:
+            st.error(f"Connection error (IPv6 issue): {error_msg}")
+            st.info("💡 Tip: If using Supabase, try using the connection pooler URL instead of the direct connection URL. Check your Supabase dashboard > Settings > Database > Connection string > Session pooler")
+        else:
+            st.error(f"Database connection error: {error_msg}")
+    else:
+        st.error(f"Error reading database: {e}")
+
+# Sidebar filters, bound as (categories, date_from, date_to). Served by the idx_tx_date
+# and idx_tx_cat_date indexes that db_utils.init_db() creates, so PostgreSQL answers them
+# with index range scans instead of scanning the whole table.
+FILTER_SQL = "WHERE category = ANY(%s) AND date BETWEEN %s AND %s"
+
+# Transactions table rows sent to the browser at a time
+PAGE_SIZE = 500
+
+@st.cache_data(ttl=5)  # Cache for 5 seconds to allow refresh
+def load_categories_and_bounds():
+    """
+    Load the sidebar options: distinct categories, date range and row count.
+    Cache refreshes every 5 seconds or when manually cleared.
+    """
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                # One round trip for everything the sidebar needs
+                cur.execute(
+                    "SELECT array_agg(DISTINCT category ORDER BY category) FILTER (WHERE category IS NOT NULL), "
+                    "MIN(date), MAX(date), COUNT(*) FROM transactions"
+                )
+                categories, date_min, date_max, row_count = cur.fetchone()
+        return categories or [], date_min, date_max, row_count
+    except Exception as e:
+        show_db_error(e)
+        return [], None, None, 0
+
+@st.cache_data(ttl=5)
+def load_recent(limit=10):
+    """Load the most recently added rows, unfiltered, for diagnostics."""
+    try:
+        with db_connection() as conn:
+            df = pd.read_sql_query(
+                # id and created_at show what the bot wrote last; other columns aren't used here
+                "SELECT id, date, category, amount, description, created_at FROM transactions "
+                "ORDER BY id DESC LIMIT %s",
+                conn,
+                params=(limit,),
+                parse_dates=['date', 'created_at'],
+                dtype_backend='pyarrow',
+            )
+        return df
+    except Exception as e:
+        show_db_error(e)
+        return pd.DataFrame()
+
+def time_bucket(date_from, date_to):
+    """
+    Pick the time-series bucket for a date range: 'day' up to 90 days,
+    'week' up to two years, 'month' beyond that, so the chart stays small.
+    """
+    days = (date_to - date_from).days
+    return 'day' if days <= 90 else 'week' if days <= 730 else 'month'
+
+def filter_key(categories, date_from, date_to):
+    """
+    Normalize the sidebar filters into the cache key for load_view() and filtered_csv().
+    Sorting makes the same selection in a different order hit the same cache entry.
+    """
+    return tuple(sorted(categories)), date_from.isoformat(), date_to.isoformat()
+
+def _query_filtered(conn, categories, date_from, date_to):
+    """Read the transactions matching the sidebar filters, newest first."""
+    column_types = {
+        'date': pa.date32(),
+        # Few distinct categories: store them once and keep int32 codes per row
+        'category': pa.dictionary(pa.int32(), pa.string()),
+        # amount is REAL in PostgreSQL: float32 holds it exactly in half the memory
+        'amount': pa.float32(),
+        'description': pa.string(),
+    }
+    buf = io.BytesIO()
+    with conn.cursor() as cur:
+        query = cur.mogrify(
+            f"SELECT {', '.join(column_types)} FROM transactions "
+            f"{FILTER_SQL} "
+            "ORDER BY date DESC, id DESC",
+            (list(categories), date_from, date_to),
+        ).decode()
+        # COPY streams the rows as CSV, which Arrow parses in C below
+        # instead of psycopg2 building a Python object per value
+        cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", buf)
+    buf.seek(0)
+    table = pcsv.read_csv(
+        buf,
+        parse_options=pcsv.ParseOptions(newlines_in_values=True),
+        # COPY writes NULL as an unquoted empty field and empty strings quoted; only the
+        # former is null, so text like "N/A" or "null" isn't caught by Arrow's default list
+        convert_options=pcsv.ConvertOptions(
+            column_types=column_types,
+            null_values=[""],
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False,
+        ),
+    )
+    # Dictionary columns come back as pandas Categoricals built from the Arrow codes;
+    # ArrowDtype(dictionary) doesn't survive Streamlit's Arrow round trip
+    return table.to_pandas(types_mapper=lambda t: None if pa.types.is_dictionary(t) else pd.ArrowDtype(t))
+
+def _query_summary(conn, categories, date_from, date_to):
+    """Total amount per category for the sidebar filters, aggregated in PostgreSQL."""
+    return pd.read_sql_query(
+        # amount is REAL: sum in double precision, rounded back to currency precision
+        "SELECT category, ROUND(SUM(amount::float8)::numeric, 2)::float8 AS amount FROM transactions "
+        f"{FILTER_SQL} "
+        "GROUP BY category ORDER BY amount DESC",
+        conn,
+        params=(list(categories), date_from, date_to),
+        dtype_backend='pyarrow',
+    )
+
+def _query_daily(conn, categories, date_from, date_to):
+    """
+    Totals per time_bucket() of the range for the sidebar filters, aggregated in PostgreSQL.
+    Returned as an amount Series on a DatetimeIndex, ready for st.line_chart.
+    """
+    bucket = time_bucket(date.fromisoformat(date_from), date.fromisoformat(date_to))
+    df = pd.read_sql_query(
+        "SELECT date_trunc(%s, date)::date AS date, ROUND(SUM(amount::float8)::numeric, 2)::float8 AS amount "
+        f"FROM transactions {FILTER_SQL} "
+        "GROUP BY 1 ORDER BY 1",
+        conn,
+        params=(bucket, list(categories), date_from, date_to),
+        index_col='date',
+        parse_dates=['date'],
+        dtype_backend='pyarrow',
+    )
+    return df['amount']
+
+@st.cache_data(ttl=5, show_spinner=False)
+def load_view(categories, date_from, date_to):
+    """
+    Load everything the data panels show for one filter combination:
+    the filtered transactions, the per-category summary and the daily totals.
+    All three queries share one pooled connection; call with filter_key(...).
+    """
+    try:
+        with db_connection() as conn:
+            return (
+                _query_filtered(conn, categories, date_from, date_to),
+                _query_summary(conn, categories, date_from, date_to),
+                _query_daily(conn, categories, date_from, date_to),
+            )
+    except Exception as e:
+        show_db_error(e)
+        return (
+            pd.DataFrame(columns=['date', 'category', 'amount', 'description']).astype({'date': 'datetime64[ns]'}),
+            pd.DataFrame(columns=['category', 'amount']),
+            pd.Series(index=pd.DatetimeIndex([], name='date'), name='amount', dtype='float64'),
+        )
+
+@st.cache_data(ttl=5, show_spinner=False)
+def filtered_csv(categories, date_from, date_to):
+    """
+    Serialize the filtered transactions to CSV bytes with Arrow's CSV writer.
+    Cached on the filters so reruns don't re-serialize an unchanged export.
+    """
+    filtered, _, _ = load_view(categories, date_from, date_to)
+    table = pa.Table.from_pandas(filtered, preserve_index=False)
+    buf = io.BytesIO()
+    pcsv.write_csv(table, buf)
+    return buf.getvalue()
+
+def page_of(table):
+    """
+    Return the PAGE_SIZE-row slice of table picked in a "Page (of N)" input, so only
+    that page is sent to the browser. The input is only shown when there is more than one page.
+    """
+    if len(table) <= PAGE_SIZE:
+        return table
+    pages = -(-len(table) // PAGE_SIZE)
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key="page")
+    return table.iloc[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
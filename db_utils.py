@@ -1,6 +1,7 @@
 # db_utils.py - Shared PostgreSQL database utilities for async operations
 import os
 import json
+import functools
 import asyncio
 import psycopg2
 from psycopg2 import pool
@@ -9,19 +10,20 @@ from datetime import datetime
 from typing import Optional, List, Tuple
 
 # Load .env file if it exists
+@functools.lru_cache(maxsize=1)
 def load_env_file():
-    """Load environment variables from .env file if it exists."""
+    """Load environment variables from .env file if it exists (parsed once per process)."""
     env_path = os.path.join(os.path.dirname(__file__), ".env")
     if os.path.exists(env_path):
         with open(env_path, "r") as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith("#") and "=" in line:
-                    key, value = line.split("=", 1)
-                    key = key.strip()
-                    value = value.strip().strip('"').strip("'")
-                    if key and value:
-                        os.environ.setdefault(key, value)
+            text = f.read()
+        for line in text.splitlines():
+            key, sep, value = line.partition("=")
+            key = key.strip()
+            if sep and key and not key.startswith("#"):
+                value = value.strip().strip('"').strip("'")
+                if value:
+                    os.environ.setdefault(key, value)
 
 # Load .env file
 load_env_file()
@@ -103,6 +105,9 @@ async def init_db():
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 );
             """)
+            # Indexes for the dashboard's date-range and category filters
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_tx_date ON transactions (date)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_tx_cat_date ON transactions (category, date)")
             conn.commit()
             cur.close()
         